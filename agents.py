@@ -1,18 +1,271 @@
 import yaml
+import copy
 import os
 import json
+import time
+import base64
+import hashlib
+import tempfile
+import asyncio
+import concurrent.futures
+import functools
+import collections
+import threading
+import mmap
 from typing import Callable, Optional
+import httpx
 import boto3
 from botocore.config import Config
+from botocore.credentials import RefreshableCredentials
+from botocore.session import get_session
 from botocore.exceptions import ClientError
 import git
 import subprocess
-import sys
-from openai import OpenAI
-import tempfile
+from openai import OpenAI, AsyncOpenAI
 import chunks
+import git2text
 from datetime import datetime
 
+# Directory for cached LLM responses, relative to the working directory
+_LLM_CACHE_DIR = ".llm_cache"
+
+# Shortest prompt prefix that Anthropic models on Bedrock will write to the prompt cache
+_MIN_CACHEABLE_PREFIX_TOKENS = 1024
+
+try:
+    import aioboto3  # Native async Bedrock calls
+except ImportError:
+    aioboto3 = None  # Async Bedrock calls fall back to the sync client on a worker thread
+
+try:
+    from yaml import CSafeLoader as _YamlLoader  # libyaml C parser
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader  # Pure-Python parser when libyaml is missing
+
+try:
+    import orjson  # Fast (de)serialization of large Bedrock request and response bodies
+except ImportError:
+    orjson = None  # Fall back to the stdlib json module
+
+try:
+    import h2  # noqa: F401  # Lets httpx multiplex concurrent CAII calls over HTTP/2
+    _HTTP2_AVAILABLE = True
+except ImportError:
+    _HTTP2_AVAILABLE = False  # httpx stays on HTTP/1.1 keep-alive connections
+
+try:
+    import tiktoken  # Real token counts for input sizing
+except ImportError:
+    tiktoken = None  # Fall back to a 4 characters per token estimate
+
+
+def _json_dumps(obj) -> bytes:
+    """Serialize a request body to bytes, which botocore accepts as-is."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode("utf-8")
+
+
+def _json_loads(data):
+    """Parse a JSON document from bytes or str."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _run_sync(coro):
+    """Run a coroutine to completion from synchronous code.
+
+    asyncio.run() refuses to start when an event loop is already running in the
+    current thread (e.g. inside a Jupyter notebook), so in that case the
+    coroutine is driven on a short-lived worker thread instead.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
+
+
+def _assume_role_session(session: boto3.Session, assumed_role: str) -> boto3.Session:
+    """Return a session whose credentials come from assuming the role and refresh before they expire."""
+    sts = session.client("sts")
+
+    def refresh():
+        response = sts.assume_role(
+            RoleArn=str(assumed_role),
+            RoleSessionName="langchain-llm-1"
+        )
+        return {
+            "access_key": response["Credentials"]["AccessKeyId"],
+            "secret_key": response["Credentials"]["SecretAccessKey"],
+            "token": response["Credentials"]["SessionToken"],
+            "expiry_time": response["Credentials"]["Expiration"].isoformat(),
+        }
+
+    credentials = RefreshableCredentials.create_from_metadata(
+        metadata=refresh(),
+        refresh_using=refresh,
+        method="sts-assume-role",
+    )
+    # Refresh shortly before expiry; botocore's 15 minute default window would
+    # refresh on every call for short-lived role sessions
+    credentials._advisory_refresh_timeout = 120
+    credentials._mandatory_refresh_timeout = 60
+
+    botocore_session = get_session()
+    botocore_session._credentials = credentials
+    return boto3.Session(botocore_session=botocore_session, region_name=session.region_name)
+
+
+# The tiktoken encoding is loaded on first use: a cold tiktoken cache downloads it
+# (with no timeout), which must not happen at import time or block indefinitely
+_TOKEN_ENCODING = None
+_TOKEN_ENCODING_LOADED = False
+_TOKEN_ENCODING_LOCK = threading.Lock()
+_TOKEN_ENCODING_TIMEOUT = float(os.environ.get("TIKTOKEN_LOAD_TIMEOUT", "10"))
+
+
+def _token_encoding():
+    """Return the tiktoken encoding, or None when token counts are estimated."""
+    global _TOKEN_ENCODING, _TOKEN_ENCODING_LOADED
+    if not _TOKEN_ENCODING_LOADED:
+        with _TOKEN_ENCODING_LOCK:
+            if not _TOKEN_ENCODING_LOADED:
+                _TOKEN_ENCODING = _load_token_encoding()
+                _TOKEN_ENCODING_LOADED = True
+    return _TOKEN_ENCODING
+
+
+def _load_token_encoding():
+    """Load cl100k_base, giving up after _TOKEN_ENCODING_TIMEOUT seconds."""
+    if tiktoken is None:
+        print("tiktoken is not installed, estimating 4 characters per token")
+        return None
+
+    # tiktoken reads TIKTOKEN_CACHE_DIR itself; a pre-populated cache loads without network access
+    result = {}
+    def load():
+        try:
+            result["encoding"] = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            result["error"] = e
+
+    loader = threading.Thread(target=load, name="tiktoken-load", daemon=True)
+    loader.start()
+    loader.join(_TOKEN_ENCODING_TIMEOUT)
+    if "encoding" in result:
+        return result["encoding"]
+    reason = result.get("error") or f"timed out after {_TOKEN_ENCODING_TIMEOUT:g}s"
+    print(f"Warning: Could not load the tiktoken encoding ({reason}), estimating 4 characters per token. "
+          f"For offline use, point TIKTOKEN_CACHE_DIR at a cache holding cl100k_base.")
+    return None
+
+
+# Token counts of recent prompts, keyed on a digest so large prompts are not kept alive
+_TOKEN_COUNTS: "collections.OrderedDict[bytes, int]" = collections.OrderedDict()
+_TOKEN_COUNTS_MAX = 16
+_TOKEN_COUNTS_LOCK = threading.Lock()
+
+
+def _count_tokens(text: str) -> int:
+    """Count the tokens in text; estimated at 4 characters per token without tiktoken."""
+    encoding = _token_encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    # A prompt is typically sized several times per call, so remember recent counts
+    key = hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+    with _TOKEN_COUNTS_LOCK:
+        count = _TOKEN_COUNTS.get(key)
+        if count is not None:
+            _TOKEN_COUNTS.move_to_end(key)
+            return count
+    count = len(encoding.encode(text, disallowed_special=()))
+    with _TOKEN_COUNTS_LOCK:
+        _TOKEN_COUNTS[key] = count
+        if len(_TOKEN_COUNTS) > _TOKEN_COUNTS_MAX:
+            _TOKEN_COUNTS.popitem(last=False)
+    return count
+
+
+def _truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text down to at most max_tokens tokens."""
+    encoding = _token_encoding()
+    if encoding is None:
+        return text[:max_tokens * 4]
+    return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+
+
+@functools.lru_cache(maxsize=16)
+def _parsed_config(path: str, mtime: float) -> dict:
+    """Parse a workflow YAML file once per modification time."""
+    with open(path, 'r') as f:
+        return yaml.load(f, Loader=_YamlLoader)
+
+
+@functools.lru_cache(maxsize=4)
+def _get_caii_api_key(jwt: str, cdp_token_env: str) -> str:
+    """Extract the CAII API key from the JWT JSON, falling back to the CDP_TOKEN value.
+
+    Cached so a token document is parsed once no matter how many clients use it.
+    """
+    if jwt:
+        return json.loads(jwt)["token"]
+    if not cdp_token_env:
+        raise RuntimeError("No JWT provided and CDP_TOKEN environment variable not set. Please provide JWT token or set CDP_TOKEN.")
+    return json.loads(cdp_token_env)["token"]
+
+
+def _jwt_expiry(token: str) -> Optional[float]:
+    """Return the 'exp' claim of a JWT as a Unix timestamp, or None if it has none."""
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))["exp"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+@functools.lru_cache(maxsize=8)
+def _build_bedrock_client(region, profile, assumed_role, url):
+    """Create a boto3 session and Bedrock runtime client, cached per (region, profile, role, url)."""
+    print(f"Create new Bedrock client\n  Using region: {region}")
+    session_kwargs = {"region_name": region}
+
+    if profile:
+        print(f"  Using profile: {profile}")
+        session_kwargs["profile_name"] = profile
+
+    retry_config = Config(
+        region_name=region,
+        read_timeout=36000,
+        retries={
+            "max_attempts": 10,
+            "mode": "standard",
+        },
+    )
+    session = boto3.Session(**session_kwargs)
+
+    if assumed_role:
+        print(f"  Using role: {assumed_role}", end='')
+        session = _assume_role_session(session, assumed_role)
+
+    client_kwargs = {}
+    if url:
+        client_kwargs["endpoint_url"] = url
+
+    bedrock_client = session.client(
+        service_name="bedrock-runtime",
+        config=retry_config,
+        **client_kwargs
+    )
+
+    print("boto3 Bedrock client successfully created!")
+    print(bedrock_client._endpoint)
+    return session, bedrock_client
+
+
 class AgenticWorkflow:
     """
     Top-level parent class for the Agentic AI Workflow System.
@@ -37,12 +290,23 @@ class AgenticWorkflow:
             jwt: str = "",
             url: Optional[str] = None,
             model_id: str = "",
+            max_parallel: int = 4,
+            latency_optimized: bool = True,
+            cache_enabled: bool = True,
         ):
             """Initialize the LLM client with optional configuration overrides."""
             self.max_tokens = max_tokens
             self.client_type = client_type
             self.jwt = jwt
             self.model_id = model_id
+            self.max_parallel = max_parallel
+            self.latency_optimized = latency_optimized
+
+            # LLM_CACHE_ENABLED in the environment overrides the argument
+            env_cache_enabled = os.environ.get("LLM_CACHE_ENABLED")
+            if env_cache_enabled is not None:
+                cache_enabled = env_cache_enabled.strip().lower() not in ("0", "false", "no", "off")
+            self.cache_enabled = cache_enabled
             
             # Determine which URL to use (prioritize 'url' over 'endpoint_url')
             target_url = url if url is not None else endpoint_url
@@ -63,186 +327,405 @@ class AgenticWorkflow:
             else:
                 target_region = region
 
-            print(f"Create new Bedrock client\\n  Using region: {target_region}")
-            session_kwargs = {"region_name": target_region}
-            client_kwargs = {**session_kwargs}
-
-            config = Config(read_timeout=36000)
-            profile_name = os.environ.get("AWS_PROFILE")
-            if profile_name:
-                print(f"  Using profile: {profile_name}")
-                session_kwargs["profile_name"] = profile_name
-
-            retry_config = Config(
-                region_name=target_region,
-                read_timeout=36000,
-                retries={
-                    "max_attempts": 10,
-                    "mode": "standard",
-                },
+            # Clients are shared between LLMClient instances with the same settings
+            self._bedrock_session, self.bedrock_client = _build_bedrock_client(
+                target_region, os.environ.get("AWS_PROFILE"), assumed_role, url
             )
-            session = boto3.Session(**session_kwargs)
-
-            if assumed_role:
-                print(f"  Using role: {assumed_role}", end='')
-                sts = session.client("sts")
-                response = sts.assume_role(
-                    RoleArn=str(assumed_role),
-                    RoleSessionName="langchain-llm-1"
-                )
-                client_kwargs["aws_access_key_id"] = response["Credentials"]["AccessKeyId"]
-                client_kwargs["aws_secret_access_key"] = response["Credentials"]["SecretAccessKey"]
-                client_kwargs["aws_session_token"] = response["Credentials"]["SessionToken"]
-
-            if url:
-                client_kwargs["endpoint_url"] = url
 
-            self.bedrock_client = session.client(
-                service_name="bedrock-runtime",
-                config=retry_config,
-                **client_kwargs
-            )
-
-            print("boto3 Bedrock client successfully created!")
-            print(self.bedrock_client._endpoint)
+            # The aioboto3 client is created lazily on the event loop that uses it
+            self._bedrock_async = None
+            self._bedrock_async_context = None
+            self._bedrock_async_loop = None
+            self._bedrock_async_lock = None
+            self._bedrock_async_credentials = None
+            self._bedrock_async_stale = []
             
         def _init_caii_client(self, url):
             """Initialize Cloudera AI Inference client."""
+            # Get JWT token from parameter or environment
+            if self.jwt:
+                print("Using provided JWT token")
+            else:
+                print("Using CDP_TOKEN from environment")
+            api_key = self._resolve_caii_api_key()
+            
+            # Initialize OpenAI client with Cloudera AI Inference endpoint
+            self.caii_client = OpenAI(
+                base_url=url,
+                api_key=api_key,
+            )
+
+            # The async client is created lazily on the event loop that uses it
+            self.caii_async = None
+            self._caii_async_loop = None
+            self._caii_http_client = None
+            
+            print("Cloudera AI Inference client successfully created!")
+            print(f"Using endpoint: {url}")
+
+        def _resolve_caii_api_key(self) -> str:
+            """Look up the CAII API key and remember when it expires."""
             try:
-                # Get JWT token from parameter or environment
-                if self.jwt:
-                    # Use provided JWT parameter
-                    jwt_data = json.loads(self.jwt)
-                    api_key = jwt_data["token"]
-                    print("Using provided JWT token")
-                else:
-                    # Read from CDP_TOKEN environment variable
-                    cdp_token = os.environ.get("CDP_TOKEN")
-                    if not cdp_token:
-                        raise RuntimeError("No JWT provided and CDP_TOKEN environment variable not set. Please provide JWT token or set CDP_TOKEN.")
-                    
-                    jwt_data = json.loads(cdp_token)
-                    api_key = jwt_data["token"]
-                    print("Using CDP_TOKEN from environment")
-                
-                # Initialize OpenAI client with Cloudera AI Inference endpoint
-                self.caii_client = OpenAI(
-                    base_url=url,
-                    api_key=api_key,
-                )
-                
-                print("Cloudera AI Inference client successfully created!")
-                print(f"Using endpoint: {url}")
-                
+                api_key = _get_caii_api_key(self.jwt, os.environ.get("CDP_TOKEN", ""))
             except json.JSONDecodeError as e:
                 raise RuntimeError(f"Invalid JWT format. Expected valid JSON: {e}")
             except KeyError:
                 raise RuntimeError("Invalid JWT structure. Expected 'token' key in JSON.")
 
-        def _call_llm(self, prompt: str, truncate_input: bool = False, use_chunks: bool = True) -> str:
-            """Call the LLM with the provided prompt."""
+            self.caii_api_key = api_key
+            expiry = _jwt_expiry(api_key)
+            # Convert the wall-clock 'exp' claim to a monotonic deadline
+            self._caii_key_deadline = None if expiry is None else time.monotonic() + (expiry - time.time())
+            return api_key
+
+        def _refresh_caii_api_key(self):
+            """Pick up a renewed token (e.g. a refreshed CDP_TOKEN) once the current one has expired."""
+            if self._caii_key_deadline is None or time.monotonic() < self._caii_key_deadline:
+                return
+            api_key = self._resolve_caii_api_key()
+            self.caii_client.api_key = api_key
+            if self.caii_async is not None:
+                self.caii_async.api_key = api_key
+
+        def _call_llm(self, prompt: str, truncate_input: bool = False, use_chunks: bool = True, prefix: str = "") -> str:
+            """Call the LLM with the provided prompt.
+
+            An optional prefix (e.g. the agent instructions) is sent ahead of every
+            chunk of the prompt and marked cacheable where the provider supports it.
+            """
+            async def call():
+                try:
+                    return await self._acall_llm(prompt, truncate_input=truncate_input, use_chunks=use_chunks, prefix=prefix)
+                finally:
+                    # The event loop ends with this call, so release its connections
+                    await self.aclose()
+
+            return _run_sync(call())
+
+        async def aclose(self):
+            """Close the async CAII and Bedrock connection pools open on the running event loop."""
+            loop = asyncio.get_running_loop()
+            http_client = getattr(self, "_caii_http_client", None)
+            if http_client is not None:
+                if self._caii_async_loop is loop:
+                    await http_client.aclose()
+                self.caii_async = None
+                self._caii_async_loop = None
+                self._caii_http_client = None
+
+            bedrock_contexts = list(getattr(self, "_bedrock_async_stale", []))
+            if getattr(self, "_bedrock_async_context", None) is not None:
+                bedrock_contexts.append(self._bedrock_async_context)
+            if bedrock_contexts:
+                if self._bedrock_async_loop is loop:
+                    for context in bedrock_contexts:
+                        await context.__aexit__(None, None, None)
+                self._drop_bedrock_async_client()
+
+        def close(self):
+            """Release the HTTP connections held by this client."""
+            if getattr(self, "caii_client", None) is not None:
+                self.caii_client.close()
+            # A pool left over from a finished event loop cannot be closed from here; drop it
+            self.caii_async = None
+            self._caii_async_loop = None
+            self._caii_http_client = None
+            self._drop_bedrock_async_client()
+
+        def _drop_bedrock_async_client(self):
+            """Forget the aioboto3 client and anything tied to its event loop."""
+            self._bedrock_async = None
+            self._bedrock_async_context = None
+            self._bedrock_async_loop = None
+            self._bedrock_async_lock = None
+            self._bedrock_async_credentials = None
+            self._bedrock_async_stale = []
+
+        async def _acall_llm(self, prompt: str, truncate_input: bool = False, use_chunks: bool = True, prefix: str = "", sink=None) -> str:
+            """Async variant of _call_llm().
+
+            When a writable `sink` is given, the response is also written to it,
+            streamed as it is generated whenever it comes from a single LLM call.
+            """
             try:
-                # Calculate max input characters based on token limit (4 chars per token estimate), reserve 25% of tokens for output
-                max_input_chars = 2 * self.max_tokens 
-                
-                # If using chunks, process iteratively
+                # Tokenizing a multi-MB prompt takes a while, so keep it off the event loop
+                max_input_tokens = await asyncio.to_thread(self._input_token_budget, prefix)
+                if max_input_tokens <= 0:
+                    raise ValueError(f"Prompt prefix alone (~{_count_tokens(prefix)} tokens) exceeds the input budget.")
+
+                # If using chunks, process them concurrently
                 if use_chunks:
-                    return self._process_with_chunks(prompt, max_input_chars)
-                
-                # Handle input truncation if requested
-                if truncate_input:
-                    if len(prompt) > max_input_chars:
-                        truncated_prompt = prompt[:max_input_chars] + "\n\n[INPUT TRUNCATED DUE TO LENGTH - ANALYSIS CONTINUES WITH AVAILABLE CONTENT]"
-                        print(f"Warning: Input truncated from {len(prompt)} to {len(truncated_prompt)} characters")
-                        prompt = truncated_prompt
-                else:
-                    # Check if input is too long and raise exception
-                    if len(prompt) > max_input_chars:
-                        raise ValueError(f"Input too long: {len(prompt)} characters (~{len(prompt)//4} tokens). "
-                                       f"Maximum supported: {max_input_chars} characters (~{max_input_chars//4} tokens). "
-                                       f"Consider processing smaller sections of the repository or using file filtering.")
-                
-                return self._single_llm_call(prompt)
-                
+                    # The chunker works in characters, so convert using this prompt's own ratio
+                    prompt_tokens = await asyncio.to_thread(_count_tokens, prompt)
+                    chars_per_token = len(prompt) / prompt_tokens if prompt_tokens else 4
+                    chunk_size = max(1, int(max_input_tokens * chars_per_token))
+                    return await self._process_with_chunks(prompt, chunk_size, prefix=prefix, sink=sink)
+
+                prompt = await asyncio.to_thread(self._fit_input, prompt, max_input_tokens, truncate_input)
+                return await self._asingle_llm_call(prompt, prefix=prefix, sink=sink)
+
             except Exception as e:
                 print(f"Error calling LLM: {str(e)}")
                 return f"Error: {str(e)}"
-                raise
 
-        def _process_with_chunks(self, prompt: str, chunk_size: int) -> str:
-            """Process the prompt using chunks and concatenate results."""
-            temp_files = []
-            output_files = []
+        def _input_token_budget(self, prefix: str = "") -> int:
+            """Tokens available for the prompt: max_tokens less 25% reserved for output and the prefix."""
+            # The prefix is repeated with every call, so it comes out of the budget
+            return self.max_tokens - self.max_tokens // 4 - _count_tokens(prefix)
+
+        def _fit_input(self, prompt: str, max_input_tokens: int, truncate_input: bool) -> str:
+            """Truncate the prompt, or reject it, when it exceeds the input token budget."""
+            prompt_tokens = _count_tokens(prompt)
+            # Handle input truncation if requested
+            if truncate_input:
+                if prompt_tokens > max_input_tokens:
+                    truncated_prompt = _truncate_to_tokens(prompt, max_input_tokens) + "\n\n[INPUT TRUNCATED DUE TO LENGTH - ANALYSIS CONTINUES WITH AVAILABLE CONTENT]"
+                    print(f"Warning: Input truncated from {len(prompt)} to {len(truncated_prompt)} characters")
+                    prompt = truncated_prompt
+            else:
+                # Check if input is too long and raise exception
+                if prompt_tokens > max_input_tokens:
+                    raise ValueError(f"Input too long: {len(prompt)} characters (~{prompt_tokens} tokens). "
+                                   f"Maximum supported: ~{max_input_tokens} tokens. "
+                                   f"Consider processing smaller sections of the repository or using file filtering.")
+            return prompt
+
+        async def _process_with_chunks(self, prompt: str, chunk_size: int, prefix: str = "", sink=None) -> str:
+            """Process the prompt chunks concurrently and concatenate results in chunk order."""
+            # Initialize the chunker with the specified size
+            chunker = chunks.MarkdownChunker(chunk_size=chunk_size)
             
-            try:
-                # Create temporary file for the prompt
-                with tempfile.NamedTemporaryFile(mode='w', suffix='.md', delete=False) as temp_file:
-                    temp_file.write(prompt)
-                    temp_file_path = temp_file.name
-                    temp_files.append(temp_file_path)
-                
-                # Initialize the chunker with the specified size
-                chunker = chunks.MarkdownChunker(chunk_size=chunk_size)
-                
-                # Run the chunker on the file
-                markdown_chunks = chunker.chunk_file(temp_file_path)
-                
-                print(f"\nFound {len(markdown_chunks)} chunks with chunk_size={chunk_size}.\n")
-                
-                # Process each chunk
-                for i, chunk in enumerate(markdown_chunks):
+            # Run the chunker on the in-memory prompt
+            markdown_chunks = chunker.chunk_text(prompt)
+            
+            print(f"\nFound {len(markdown_chunks)} chunks with chunk_size={chunk_size}.\n")
+            
+            # Process the chunks concurrently, at most max_parallel LLM calls in flight
+            semaphore = asyncio.Semaphore(self.max_parallel)
+
+            # A single chunk can stream straight into the sink
+            chunk_sink = sink if len(markdown_chunks) == 1 else None
+
+            async def bounded_call(i, chunk):
+                async with semaphore:
                     print(f"--- Processing Chunk {i+1} (Length: {len(chunk)}) ---")
-                    
-                    # Call LLM for this chunk
-                    chunk_response = self._single_llm_call(chunk)
-                    
-                    # Save chunk response to temporary file
-                    with tempfile.NamedTemporaryFile(mode='w', suffix=f'_chunk_{i+1}.md', delete=False) as output_file:
-                        output_file.write(chunk_response)
-                        output_files.append(output_file.name)
-                    
+                    chunk_response = await self._asingle_llm_call(chunk, prefix=prefix, sink=chunk_sink)
                     print(f"Completed chunk {i+1}/{len(markdown_chunks)}")
-                
-                # Concatenate all outputs
-                final_response = ""
-                for output_file in output_files:
-                    with open(output_file, 'r') as f:
-                        final_response += f.read() + "\n\n"
-                
-                return final_response.strip()
-                
-            except FileNotFoundError as e:
-                print(f"Error: {e}")
-                print("Please ensure the MarkdownChunker class is defined correctly.")
-                raise
+                    return chunk_response
+
+            # Concurrent requests cannot read a prompt cache entry that is still being
+            # written, so let the first chunk populate it before fanning out the rest
+            results = []
+            if len(markdown_chunks) > 1 and self._prefix_is_cacheable(prefix):
+                results.append(await bounded_call(0, markdown_chunks[0]))
+            first = len(results)
+
+            # gather() preserves chunk order in the results
+            results += await asyncio.gather(*[
+                bounded_call(i, markdown_chunks[i]) for i in range(first, len(markdown_chunks))
+            ])
+            
+            final_response = "\n\n".join(results).strip()
+            if sink is not None and chunk_sink is None:
+                sink.write(final_response)
+            return final_response
+
+        @staticmethod
+        def _unchunked_prompt(prompt: str, use_chunks: bool) -> str:
+            """The text sent for a prompt that fits in one call; the chunker strips a lone chunk."""
+            return prompt.strip() if use_chunks else prompt
+
+        def _prefix_is_cacheable(self, prefix: str) -> bool:
+            """Whether Bedrock will cache this prefix (it ignores checkpoints on short prefixes)."""
+            return self.client_type == "bedrock" and _count_tokens(prefix) >= _MIN_CACHEABLE_PREFIX_TOKENS
+
+        async def _acall_llm_tools(self, prompt: str, tasks: dict) -> dict:
+            """Run several tasks over one prompt in a single call using parallel tool calls.
+
+            `tasks` maps an output key to that task's instructions. One tool is
+            declared per task and the model is asked to call each of them once;
+            the returned dict maps every output key the model wrote to its content.
+            """
+            keys = list(tasks)
+            tool_names = {f"write_output_{n+1}": key for n, key in enumerate(keys)}
+
+            sections = [
+                f"You will perform {len(keys)} independent tasks on the same input data. "
+                f"Call each task's tool exactly once with the complete output for that task.\n"
+            ]
+            for name, key in tool_names.items():
+                sections.append(f"=== TASK for tool `{name}` (output: {key}) ===\n{tasks[key]}")
+            sections.append(prompt)
+            full_prompt = "\n".join(sections)
+
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
+            print(f"[{timestamp}] Making batched LLM call for {len(keys)} tasks with model: {self.model_id}")
+
+            if self.client_type == "bedrock":
+                calls = await self._abedrock_tool_calls(full_prompt, tool_names)
+            elif self.client_type == "caii":
+                calls = await self._acaii_tool_calls(full_prompt, tool_names)
+            else:
+                raise ValueError(f"Unsupported client_type: {self.client_type}")
+
+            return {tool_names[name]: content for name, content in calls if name in tool_names}
+
+        async def _abedrock_tool_calls(self, prompt: str, tool_names: dict) -> list:
+            """Ask Bedrock to call the given tools and return (tool name, content) pairs."""
+            body = _json_dumps({
+                "anthropic_version": "bedrock-2023-05-31",
+                "max_tokens": self.max_tokens,
+                "tools": [
+                    {
+                        "name": name,
+                        "description": f"Write the complete output for {key}.",
+                        "input_schema": {
+                            "type": "object",
+                            "properties": {"content": {"type": "string"}},
+                            "required": ["content"],
+                        },
+                    }
+                    for name, key in tool_names.items()
+                ],
+                "tool_choice": {"type": "any"},
+                "messages": [
+                    {
+                        "role": "user",
+                        "content": prompt
+                    }
+                ]
+            })
+            response_body = await self._ainvoke_bedrock(body)
+            return [
+                (block["name"], block["input"].get("content", ""))
+                for block in response_body["content"]
+                if block.get("type") == "tool_use"
+            ]
+
+        async def _acaii_tool_calls(self, prompt: str, tool_names: dict) -> list:
+            """Ask Cloudera AI Inference to call the given tools and return (tool name, content) pairs."""
+            self._refresh_caii_api_key()
+            try:
+                response = await self._get_caii_async_client().chat.completions.create(
+                    model=self.model_id,
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": prompt
+                        }
+                    ],
+                    tools=[
+                        {
+                            "type": "function",
+                            "function": {
+                                "name": name,
+                                "description": f"Write the complete output for {key}.",
+                                "parameters": {
+                                    "type": "object",
+                                    "properties": {"content": {"type": "string"}},
+                                    "required": ["content"],
+                                },
+                            },
+                        }
+                        for name, key in tool_names.items()
+                    ],
+                    tool_choice="required",
+                    max_tokens=self.max_tokens,
+                    temperature=0.1
+                )
             except Exception as e:
-                print(f"An unexpected error occurred during chunking: {e}")
+                print(f"CAII invocation failed: {e}")
                 raise
-            finally:
-                # Clean up temporary files
-                for temp_file in temp_files + output_files:
-                    try:
-                        if os.path.exists(temp_file):
-                            os.unlink(temp_file)
-                    except Exception as e:
-                        print(f"Warning: Could not delete temporary file {temp_file}: {e}")
 
-        def _single_llm_call(self, prompt: str) -> str:
+            return [
+                (call.function.name, json.loads(call.function.arguments).get("content", ""))
+                for call in response.choices[0].message.tool_calls or []
+            ]
+
+        def _single_llm_call(self, prompt: str, prefix: str = "") -> str:
             """Make a single LLM call with the provided prompt."""
+            cached_response = self._read_cached_response(prompt, prefix)
+            if cached_response is not None:
+                return cached_response
+
             # Print timestamp before LLM call
             timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
             print(f"[{timestamp}] Making LLM call with model: {self.model_id}")
             
             if self.client_type == "bedrock":
-                return self._single_bedrock_call(prompt)
+                response = self._single_bedrock_call(prompt, prefix=prefix)
             elif self.client_type == "caii":
-                return self._single_caii_call(prompt)
+                response = self._single_caii_call(prompt, prefix=prefix)
             else:
                 raise ValueError(f"Unsupported client_type: {self.client_type}")
 
-        def _single_bedrock_call(self, prompt: str) -> str:
-            """Make a single AWS Bedrock call."""
-            body = json.dumps({
+            self._write_cached_response(prompt, prefix, response)
+            return response
+
+        async def _asingle_llm_call(self, prompt: str, prefix: str = "", sink=None) -> str:
+            """Async variant of _single_llm_call(); streams the response into `sink` when given."""
+            cached_response = await asyncio.to_thread(self._read_cached_response, prompt, prefix)
+            if cached_response is not None:
+                if sink is not None:
+                    sink.write(cached_response)
+                return cached_response
+
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
+            print(f"[{timestamp}] Making LLM call with model: {self.model_id}")
+
+            if sink is not None and self.client_type == "bedrock":
+                response = await asyncio.to_thread(self._single_bedrock_call_stream, prompt, sink, prefix)
+            elif sink is not None and self.client_type == "caii":
+                response = await self._asingle_caii_call_stream(prompt, sink, prefix)
+            elif self.client_type == "bedrock":
+                response = await self._asingle_bedrock_call(prompt, prefix=prefix)
+            elif self.client_type == "caii":
+                response = await self._asingle_caii_call(prompt, prefix=prefix)
+            else:
+                raise ValueError(f"Unsupported client_type: {self.client_type}")
+
+            await asyncio.to_thread(self._write_cached_response, prompt, prefix, response)
+            return response
+
+        def _cache_path(self, prompt: str, prefix: str) -> str:
+            """Content-addressed cache file for a request to this model."""
+            key_material = "\0".join((self.client_type, self.model_id, str(self.max_tokens), prefix, prompt))
+            key = hashlib.blake2b(key_material.encode("utf-8"), digest_size=16).hexdigest()
+            return os.path.join(_LLM_CACHE_DIR, key)
+
+        def _read_cached_response(self, prompt: str, prefix: str) -> Optional[str]:
+            """Return the cached response for an identical earlier request, if any."""
+            if not self.cache_enabled:
+                return None
+            cache_path = self._cache_path(prompt, prefix)
+            try:
+                with open(cache_path, 'r', encoding='utf-8') as f:
+                    response = f.read()
+            except FileNotFoundError:
+                return None
+            print(f"Using cached LLM response: {cache_path}")
+            return response
+
+        def _write_cached_response(self, prompt: str, prefix: str, response: str):
+            """Store a response in the cache, writing atomically so readers never see partial files."""
+            if not self.cache_enabled:
+                return
+            try:
+                os.makedirs(_LLM_CACHE_DIR, exist_ok=True)
+                with tempfile.NamedTemporaryFile(mode='w', encoding='utf-8', dir=_LLM_CACHE_DIR, delete=False) as temp_file:
+                    temp_file.write(response)
+                os.replace(temp_file.name, self._cache_path(prompt, prefix))
+            except OSError as e:
+                print(f"Warning: Could not write LLM response cache: {e}")
+
+        def _bedrock_request_body(self, prompt: str, prefix: str = "") -> bytes:
+            """Build the Anthropic messages request body for Bedrock.
+
+            A non-empty prefix is sent as the system prompt with a cache
+            checkpoint, so repeated calls (e.g. one per chunk) can reuse the
+            processed prefix.
+            """
+            body = {
                 "anthropic_version": "bedrock-2023-05-31",
                 "max_tokens": self.max_tokens, 
                 "messages": [
@@ -251,15 +734,91 @@ class AgenticWorkflow:
                         "content": prompt
                     }
                 ]
-            })
-            
+            }
+            if prefix:
+                body["system"] = [{"type": "text", "text": prefix, "cache_control": {"type": "ephemeral"}}]
+            return _json_dumps(body)
+
+        def _bedrock_invoke_kwargs(self, body: bytes) -> dict:
+            """Build the invoke_model arguments, requesting latency-optimized inference when enabled."""
+            invoke_kwargs = {
+                "modelId": self.model_id,
+                "body": body,
+                "contentType": "application/json",
+                "accept": "application/json",
+            }
+            if self.latency_optimized:
+                invoke_kwargs["performanceConfigLatency"] = "optimized"
+            return invoke_kwargs
+
+        def _fallback_from_latency_optimized(self, error: ClientError) -> bool:
+            """Disable latency-optimized inference if the model rejected it; returns True when worth retrying."""
+            if not self.latency_optimized or error.response['Error']['Code'] != 'ValidationException':
+                return False
+            # Other validation failures (e.g. input too long) must surface unchanged
+            message = error.response['Error'].get('Message', '').lower()
+            if 'performance' not in message and 'latency' not in message:
+                return False
+            print(f"Latency-optimized inference not available for {self.model_id}, falling back to standard latency")
+            self.latency_optimized = False
+            return True
+
+        def _single_bedrock_call(self, prompt: str, prefix: str = "") -> str:
+            """Make a single AWS Bedrock call."""
+            response_body = self._invoke_bedrock(self._bedrock_request_body(prompt, prefix))
+            return response_body['content'][0]['text']
+
+        async def _asingle_bedrock_call(self, prompt: str, prefix: str = "") -> str:
+            """Make a single AWS Bedrock call without blocking the event loop."""
+            response_body = await self._ainvoke_bedrock(self._bedrock_request_body(prompt, prefix))
+            return response_body['content'][0]['text']
+
+        def _single_bedrock_call_stream(self, prompt: str, sink, prefix: str = "") -> str:
+            """Make a single AWS Bedrock call, writing text deltas to `sink` as they arrive."""
+            body = self._bedrock_request_body(prompt, prefix)
+
             try:
-                response = self.bedrock_client.invoke_model(
-                    modelId=self.model_id,
-                    body=body,
-                    contentType="application/json",
-                    accept="application/json"
-                )
+                try:
+                    response = self.bedrock_client.invoke_model_with_response_stream(**self._bedrock_invoke_kwargs(body))
+                except ClientError as e:
+                    if not self._fallback_from_latency_optimized(e):
+                        raise
+                    response = self.bedrock_client.invoke_model_with_response_stream(**self._bedrock_invoke_kwargs(body))
+
+                parts = []
+                for event in response['body']:
+                    if 'chunk' not in event:
+                        continue
+                    raw = event['chunk']['bytes']
+                    # Only text deltas carry output; skip decoding start/stop/ping events
+                    if b'text_delta' not in raw:
+                        continue
+                    event_json = _json_loads(raw)
+                    if event_json.get('type') == 'content_block_delta' and event_json['delta'].get('type') == 'text_delta':
+                        text = event_json['delta']['text']
+                        sink.write(text)
+                        sink.flush()
+                        parts.append(text)
+            except ClientError as e:
+                error_code = e.response['Error']['Code']
+                error_message = e.response['Error']['Message']
+                print(f"Bedrock invocation failed: {error_code} - {error_message}")
+                raise
+            except Exception as e:
+                print(f"An unexpected error occurred: {e}")
+                raise
+
+            return "".join(parts)
+
+        def _invoke_bedrock(self, body: bytes) -> dict:
+            """Invoke the Bedrock model with a request body and return the parsed response body."""
+            try:
+                try:
+                    response = self.bedrock_client.invoke_model(**self._bedrock_invoke_kwargs(body))
+                except ClientError as e:
+                    if not self._fallback_from_latency_optimized(e):
+                        raise
+                    response = self.bedrock_client.invoke_model(**self._bedrock_invoke_kwargs(body))
                 # Process successful response
             except ClientError as e:
                 error_code = e.response['Error']['Code']
@@ -271,18 +830,61 @@ class AgenticWorkflow:
                 print(f"An unexpected error occurred: {e}")
                 raise
             
-            response_body = json.loads(response['body'].read())
-            return response_body['content'][0]['text']
+            return _json_loads(response['body'].read())
+
+        async def _ainvoke_bedrock(self, body: bytes) -> dict:
+            """Async variant of _invoke_bedrock()."""
+            if aioboto3 is None:
+                return await asyncio.to_thread(self._invoke_bedrock, body)
+
+            client = await self._get_bedrock_async_client()
+            try:
+                try:
+                    response = await client.invoke_model(**self._bedrock_invoke_kwargs(body))
+                except ClientError as e:
+                    if not self._fallback_from_latency_optimized(e):
+                        raise
+                    response = await client.invoke_model(**self._bedrock_invoke_kwargs(body))
+                return _json_loads(await response['body'].read())
+            except ClientError as e:
+                error_code = e.response['Error']['Code']
+                error_message = e.response['Error']['Message']
+                print(f"Bedrock invocation failed: {error_code} - {error_message}")
+                raise
+            except Exception as e:
+                print(f"An unexpected error occurred: {e}")
+                raise
 
-        def _single_caii_call(self, prompt: str) -> str:
+        def _single_caii_call(self, prompt: str, prefix: str = "") -> str:
             """Make a single Cloudera AI Inference call."""
+            self._refresh_caii_api_key()
             try:
                 response = self.caii_client.chat.completions.create(
                     model=self.model_id,
                     messages=[
                         {
                             "role": "user",
-                            "content": prompt
+                            "content": prefix + prompt
+                        }
+                    ],
+                    max_tokens=self.max_tokens,
+                    temperature=0.1
+                )
+                return response.choices[0].message.content
+            except Exception as e:
+                print(f"CAII invocation failed: {e}")
+                raise
+
+        async def _asingle_caii_call(self, prompt: str, prefix: str = "") -> str:
+            """Make a single Cloudera AI Inference call without blocking the event loop."""
+            self._refresh_caii_api_key()
+            try:
+                response = await self._get_caii_async_client().chat.completions.create(
+                    model=self.model_id,
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": prefix + prompt
                         }
                     ],
                     max_tokens=self.max_tokens,
@@ -292,6 +894,98 @@ class AgenticWorkflow:
             except Exception as e:
                 print(f"CAII invocation failed: {e}")
                 raise
+
+        async def _asingle_caii_call_stream(self, prompt: str, sink, prefix: str = "") -> str:
+            """Make a single Cloudera AI Inference call, writing text deltas to `sink` as they arrive."""
+            self._refresh_caii_api_key()
+            try:
+                stream = await self._get_caii_async_client().chat.completions.create(
+                    model=self.model_id,
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": prefix + prompt
+                        }
+                    ],
+                    max_tokens=self.max_tokens,
+                    temperature=0.1,
+                    stream=True
+                )
+                parts = []
+                async for chunk in stream:
+                    if not chunk.choices or not chunk.choices[0].delta.content:
+                        continue
+                    text = chunk.choices[0].delta.content
+                    sink.write(text)
+                    sink.flush()
+                    parts.append(text)
+                return "".join(parts)
+            except Exception as e:
+                print(f"CAII invocation failed: {e}")
+                raise
+
+        async def _get_bedrock_async_client(self):
+            """Return an aioboto3 bedrock-runtime client bound to the running event loop.
+
+            Like the CAII client, it is rebuilt when a different loop drives the calls,
+            and also when the shared boto3 session's credentials have been refreshed.
+            """
+            loop = asyncio.get_running_loop()
+            if self._bedrock_async_loop is not loop:
+                self._drop_bedrock_async_client()
+                self._bedrock_async_loop = loop
+                self._bedrock_async_lock = asyncio.Lock()
+
+            # Credential refreshes may call STS, so keep them off the event loop
+            credentials = await asyncio.to_thread(
+                lambda: self._bedrock_session.get_credentials().get_frozen_credentials()
+            )
+            async with self._bedrock_async_lock:
+                if self._bedrock_async is not None and credentials == self._bedrock_async_credentials:
+                    return self._bedrock_async
+                if self._bedrock_async_context is not None:
+                    # Calls may still be in flight on the old client; close it in aclose()
+                    self._bedrock_async_stale.append(self._bedrock_async_context)
+
+                session = aioboto3.Session(
+                    aws_access_key_id=credentials.access_key,
+                    aws_secret_access_key=credentials.secret_key,
+                    aws_session_token=credentials.token,
+                    region_name=self._bedrock_session.region_name,
+                )
+                client_kwargs = {"endpoint_url": self.url} if self.url else {}
+                context = session.client(
+                    "bedrock-runtime",
+                    config=self.bedrock_client.meta.config,
+                    **client_kwargs
+                )
+                self._bedrock_async = await context.__aenter__()
+                self._bedrock_async_context = context
+                self._bedrock_async_credentials = credentials
+            return self._bedrock_async
+
+        def _get_caii_async_client(self) -> AsyncOpenAI:
+            """Return an AsyncOpenAI client bound to the running event loop.
+
+            Pooled httpx connections cannot be shared between event loops, so the
+            client is rebuilt whenever a different loop drives the calls.
+            """
+            loop = asyncio.get_running_loop()
+            if self._caii_async_loop is not loop:
+                # Size the keep-alive pool for concurrent steps and chunks so calls reuse
+                # open connections instead of paying a TCP/TLS handshake each
+                self._caii_http_client = httpx.AsyncClient(
+                    limits=httpx.Limits(max_connections=64, max_keepalive_connections=64),
+                    http2=_HTTP2_AVAILABLE,
+                    timeout=httpx.Timeout(600.0),
+                )
+                self.caii_async = AsyncOpenAI(
+                    base_url=self.url,
+                    api_key=self.caii_api_key,
+                    http_client=self._caii_http_client,
+                )
+                self._caii_async_loop = loop
+            return self.caii_async
     
     class Agent:
             """Represents a single agent in the AI system."""
@@ -303,6 +997,8 @@ class AgenticWorkflow:
                 self.key_traits = agent_config.get("key_traits", [])
                 self.input_sample = agent_config.get("input_sample", "")
                 self.output_sample = agent_config.get("output_sample", "")
+                # Inputs shorter than this are not worth an LLM call
+                self.min_input_chars = agent_config.get("min_input_chars", 1)
                 self.truncate_input = truncate_input
                 self.use_chunks = use_chunks
                 self.client_type = client_type
@@ -313,24 +1009,25 @@ class AgenticWorkflow:
                 if not self.name or not self.objective:
                     raise ValueError("Agent configuration must include 'name' and 'objective'.")
 
+                # The instructions only depend on the config, so build them once
+                # instead of on every call; only the input data changes per call
+                self._prompt_prefix = self._build_prompt_prefix()
+                self._fmt_by_ext = {
+                    '.json': "Your final output must be a single, valid JSON object and nothing else.",
+                    '.md': "Your final output must be formatted in Markdown.",
+                    '': "Your final output should be plain text.",
+                }
+
             def execute(self, input_content: str, output_path: str) -> str:
                 """Executes the agent's task by formatting a prompt and calling the LLM."""
                 try:
-                    if not isinstance(input_content, str):
-                        raise ValueError(f"Input content must be a string, got {type(input_content)}")
-                    if not isinstance(output_path, str):
-                        raise ValueError(f"Output path must be a string, got {type(output_path)}")
-                    
-                    prompt = self._format_prompt(input_content, output_path)
-                    
-                    if not prompt or not isinstance(prompt, str):
-                        raise ValueError(f"Generated prompt is invalid: {type(prompt)}")
-                    
-                    # Validate inputs
-                    if not isinstance(prompt, str):
-                        raise ValueError(f"Prompt must be a string, got {type(prompt)}")
+                    shortcut = self._shortcut_response(input_content, output_path)
+                    if shortcut is not None:
+                        return shortcut
+
+                    prefix, prompt = self._build_prompt(input_content, output_path)
                     
-                    response = self.llm_client._call_llm(prompt, truncate_input=self.truncate_input, use_chunks=self.use_chunks)
+                    response = self.llm_client._call_llm(prompt, truncate_input=self.truncate_input, use_chunks=self.use_chunks, prefix=prefix)
                     print(f"Received response (length: {len(response)} chars)")
                     return response
                     
@@ -338,18 +1035,86 @@ class AgenticWorkflow:
                     error_msg = f"Error executing agent '{self.name}': {str(e)}"
                     return f"Error: {error_msg}"
 
-            def _format_prompt(self, input_content: str, output_path: str) -> str:
-                """Creates a detailed, structured prompt for the LLM."""
-                responsibilities = "\\n".join(f"- {r}" for r in self.core_responsibilities)
-                traits = ", ".join(self.key_traits)
+            async def aexecute(self, input_content: str, output_path: str, sink=None) -> str:
+                """Async variant of execute() so independent DAG steps can run concurrently.
+
+                If `sink` is given, the response is also streamed into it.
+                """
+                try:
+                    shortcut = self._shortcut_response(input_content, output_path)
+                    if shortcut is not None:
+                        if sink is not None and not shortcut.startswith("Error:"):
+                            sink.write(shortcut)
+                        return shortcut
+
+                    prefix, prompt = self._build_prompt(input_content, output_path)
+
+                    response = await self.llm_client._acall_llm(prompt, truncate_input=self.truncate_input, use_chunks=self.use_chunks, prefix=prefix, sink=sink)
+                    print(f"Received response (length: {len(response)} chars)")
+                    return response
+
+                except Exception as e:
+                    error_msg = f"Error executing agent '{self.name}': {str(e)}"
+                    return f"Error: {error_msg}"
+
+            def _shortcut_response(self, input_content: str, output_path: str) -> Optional[str]:
+                """Return a response that needs no LLM call, or None if the input should be analyzed.
+
+                Empty inputs get a placeholder output, and an error produced by an
+                upstream step is passed on instead of being sent to the LLM.
+                """
+                if not isinstance(input_content, str):
+                    return None  # Rejected by _build_prompt()
+                if input_content.startswith("Error:"):
+                    return f"Error: Input for agent '{self.name}' is an upstream error: {input_content[len('Error:'):].strip()}"
+                if len(input_content) < self.min_input_chars or not input_content.strip():
+                    print(f"Agent '{self.name}' received no usable input, skipping the LLM call")
+                    return self._empty_response_stub(output_path)
+                return None
+
+            def _empty_response_stub(self, output_path: str) -> str:
+                """Placeholder output, in the step's output format, for an empty input."""
+                message = f"No input was provided to agent '{self.name}', so no analysis was performed."
+                if os.path.splitext(output_path)[1].lower() == '.json':
+                    return json.dumps({"agent": self.name, "status": "skipped", "reason": message})
+                return message + "\n"
+
+            def _build_prompt(self, input_content: str, output_path: str) -> tuple[str, str]:
+                """Validates the inputs and formats the (prefix, prompt) pair for the LLM."""
+                if not isinstance(input_content, str):
+                    raise ValueError(f"Input content must be a string, got {type(input_content)}")
+                if not isinstance(output_path, str):
+                    raise ValueError(f"Output path must be a string, got {type(output_path)}")
                 
+                prefix, prompt = self._format_prompt(input_content, output_path)
+                
+                if not prompt or not isinstance(prompt, str):
+                    raise ValueError(f"Generated prompt is invalid: {type(prompt)}")
+                
+                return prefix, prompt
+
+            def _format_prompt(self, input_content: str, output_path: str) -> tuple[str, str]:
+                """Creates a detailed, structured prompt for the LLM.
+
+                Returns the static agent instructions (a cacheable prefix) and the
+                per-call input section separately.
+                """
                 file_extension = os.path.splitext(output_path)[1].lower()
-                if file_extension == '.json':
-                    output_format_instruction = "Your final output must be a single, valid JSON object and nothing else."
-                elif file_extension == '.md':
-                    output_format_instruction = "Your final output must be formatted in Markdown."
-                else:
-                    output_format_instruction = "Your final output should be plain text."
+                output_format_instruction = self._fmt_by_ext.get(file_extension, self._fmt_by_ext[''])
+
+                prefix = f"{self._prompt_prefix}**Output Format Requirement:** {output_format_instruction}\n\n"
+                prompt = f"""--- INPUT DATA ---
+{input_content}
+--- END INPUT DATA ---
+
+Generate your response now.
+"""
+                return prefix, prompt
+
+            def _build_prompt_prefix(self) -> str:
+                """Builds the agent instructions that are identical for every call."""
+                responsibilities = "\n".join(f"- {r}" for r in self.core_responsibilities)
+                traits = ", ".join(self.key_traits)
 
                 input_sample_section = ""
                 if self.input_sample.strip():
@@ -382,13 +1147,6 @@ Your core responsibilities are:
 {responsibilities}
 {input_sample_section}{output_sample_section}
 Based on the input data below, perform your task and generate the required output.
-**Output Format Requirement:** {output_format_instruction}
-
---- INPUT DATA ---
-{input_content}
---- END INPUT DATA ---
-
-Generate your response now.
 """
 
 
@@ -403,11 +1161,21 @@ Generate your response now.
             self.cloned_repo = None
             
         def clone_repository(self) -> str:
-            """Clone the repository and return the clone path."""
+            """Clone the repository, or update an existing clean clone of it, and return the clone path."""
+            # Pull into an existing clone of the same repository instead of re-cloning
+            if os.path.isdir(os.path.join(self.clone_path, ".git")):
+                try:
+                    existing_repo = git.Repo(self.clone_path)
+                    if existing_repo.remotes.origin.url == self.repo_url and not existing_repo.is_dirty(untracked_files=True):
+                        existing_repo.remotes.origin.pull()
+                        self.cloned_repo = existing_repo
+                        return self.clone_path
+                except Exception as e:
+                    print(f"Could not update existing clone, cloning again: {e}")
+
             # Remove existing directory if it exists
             if os.path.exists(self.clone_path):
-                import shutil
-                shutil.rmtree(self.clone_path)
+                self._remove_tree(self.clone_path)
             
             try:
                 # Clone the repository
@@ -417,7 +1185,7 @@ Generate your response now.
                 raise
         
         def convert_to_markdown(self, output_path: str = "data/inputs/codebase_context.md") -> str:
-            """Convert the cloned repository to markdown using git2text.py."""
+            """Convert the cloned repository to markdown using git2text (run in-process)."""
             if not self.cloned_repo or not os.path.exists(self.clone_path):
                 raise ValueError("Repository must be cloned before conversion. Call clone_repository() first.")
             
@@ -425,11 +1193,6 @@ Generate your response now.
                 # Ensure output directory exists
                 os.makedirs(os.path.dirname(output_path), exist_ok=True)
                 
-                # Check if git2text.py exists
-                git2text_path = "git2text.py"
-                if not os.path.exists(git2text_path):
-                    raise FileNotFoundError(f"git2text.py not found in current directory. This file is required for markdown conversion.")
-                
                 # Check if clone path exists and has content
                 if not os.path.exists(self.clone_path):
                     raise RuntimeError(f"Clone path does not exist: {self.clone_path}")
@@ -441,17 +1204,12 @@ Generate your response now.
                 # Get absolute path for output
                 abs_output_path = os.path.abspath(output_path)
                 
-                # Run git2text.py on the cloned repository with output file
-                cmd = [sys.executable, git2text_path, self.clone_path, "-o", abs_output_path]
-                result = subprocess.run(cmd, capture_output=True, text=True)
-                
-                if result.returncode != 0:
-                    error_details = f"Return code: {result.returncode}"
-                    if result.stderr:
-                        error_details += f", stderr: {result.stderr}"
-                    if result.stdout:
-                        error_details += f", stdout: {result.stdout}"
-                    raise RuntimeError(f"git2text.py failed - {error_details}")
+                # Run git2text on the cloned repository with output file, avoiding
+                # a fresh interpreter start-up and re-import for every conversion
+                try:
+                    git2text.convert(self.clone_path, output_path=abs_output_path)
+                except git2text.ConversionError as e:
+                    raise RuntimeError(f"git2text failed - {e}") from e
                 
                 # Check if output file was created
                 if not os.path.exists(abs_output_path):
@@ -474,16 +1232,24 @@ Generate your response now.
         def cleanup(self):
             """Clean up cloned repository directory."""
             if os.path.exists(self.clone_path):
+                self._remove_tree(self.clone_path)
+
+        @staticmethod
+        def _remove_tree(path: str):
+            """Delete a directory tree, using the native rm on POSIX for large .git trees."""
+            if os.name == "posix":
+                subprocess.run(["rm", "-rf", path], check=True)
+            else:
                 import shutil
-                shutil.rmtree(self.clone_path)
+                shutil.rmtree(path)
 
     class DAGConstructor:
         """Constructs an executable DAG function from a YAML configuration file."""
         
-        def __init__(self, config_path: str = "./sec_agents.yaml", llm_client: Optional['AgenticWorkflow.LLMClient'] = None, truncate_input: bool = False, use_chunks: bool = True, client_type: str = "caii",jwt: str =""):
+        def __init__(self, config_path: str = "./sec_agents.yaml", llm_client: Optional['AgenticWorkflow.LLMClient'] = None, truncate_input: bool = False, use_chunks: bool = True, client_type: str = "caii",jwt: str ="", max_parallel: int = 4, model_id: str = "", url: Optional[str] = None, batch_shared_inputs: bool = False, stream_outputs: bool = True):
             """Initialize the constructor by loading and parsing the YAML configuration."""
-            with open(config_path, 'r') as f:
-                config = yaml.safe_load(f)
+            # Copy the cached parse so changes made to this DAG cannot leak into the next one
+            config = copy.deepcopy(_parsed_config(config_path, os.path.getmtime(config_path)))
             
             self.steps = config.get("dag_flow", [])
             self.llm_client = llm_client
@@ -491,8 +1257,15 @@ Generate your response now.
             self.use_chunks = use_chunks
             self.client_type = client_type
             self.jwt = jwt
+            self.max_parallel = max_parallel
+            self.batch_shared_inputs = batch_shared_inputs
+            self.stream_outputs = stream_outputs
+
+            # Build a single LLM client shared by every agent, rather than one per agent
+            if self.llm_client is None:
+                self.llm_client = AgenticWorkflow.LLMClient(client_type=self.client_type, jwt=self.jwt, url=url, model_id=model_id)
             
-            # Create agents with LLM client
+            # Create agents with the shared LLM client
             self.agents = {
                 agent_def["name"]: AgenticWorkflow.Agent(
                     agent_def, 
@@ -508,49 +1281,265 @@ Generate your response now.
             if not self.steps or not self.agents:
                 raise ValueError("YAML must contain 'dag_flow' and 'agents' definitions.")
 
+            # Build the step dependency graph from the file paths each step reads and writes.
+            # A step waits for the latest earlier step that produces its input (read-after-write),
+            # for steps that read the file it overwrites since that file was last written
+            # (write-after-read), and for the latest step that wrote the same file. Earlier
+            # conflicting steps are already ordered before these through their own edges.
+            produced_by = {}
+            read_by = {}
+            self.deps = {}
+            for i, step_config in enumerate(self.steps):
+                input_path, output_path = step_config["input"], step_config["output"]
+                deps = set(read_by.get(output_path, ()))
+                if input_path in produced_by:
+                    deps.add(produced_by[input_path])
+                if output_path in produced_by:
+                    deps.add(produced_by[output_path])
+                self.deps[i] = deps
+                read_by.setdefault(input_path, []).append(i)
+                produced_by[output_path] = i
+                read_by[output_path] = []
+
         def build_executor(self) -> Callable[[], None]:
             """Build and return a function that executes the entire DAG."""
             def dag_executor():
                 """Execute the agentic workflow."""
                 try:
-                    for i, step_config in enumerate(self.steps):
-                        agent_name = step_config["agent"]
-                        input_path = step_config["input"]
-                        output_path = step_config["output"]
-
-                        print(f"\n ========== Executing Step {i+1}/{len(self.steps)}: {agent_name} ==========")
-                        
-                        agent = self.agents.get(agent_name)
-                        if not agent:
-                            raise RuntimeError(f"Agent '{agent_name}' defined in DAG flow but not found in agent definitions.")
-
-                        # Read input file
-                        try:
-                            with open(input_path, 'r') as f:
-                                input_content = f.read()
-                        except FileNotFoundError as e:
-                            raise RuntimeError(f"Input file not found for step {i+1} ({agent_name}): {input_path}") from e
-                        
-                        # Execute agent
-                        output_content = agent.execute(input_content, output_path)
-                        
-                        # Check if agent execution returned an error
-                        if output_content.startswith("Error:"):
-                            raise RuntimeError(f"Step {i+1} ({agent_name}) failed: {output_content}")
-
-                        # Write output file
-                        try:
-                            os.makedirs(os.path.dirname(output_path), exist_ok=True)
-                            with open(output_path, 'w') as f:
-                                f.write(output_content)
-                        except Exception as e:
-                            raise RuntimeError(f"Failed to write output file for step {i+1} ({agent_name}): {output_path}") from e
-                    
-                    print("\\nWorkflow completed successfully.")
+                    _run_sync(self._execute_dag())
+                    print("\nWorkflow completed successfully.")
                     
                 except Exception as e:
-                    print(f"\\nWorkflow failed: {str(e)}")
+                    print(f"\nWorkflow failed: {str(e)}")
                     raise
             
             return dag_executor
-    
\ No newline at end of file
+
+        def _group_parallel_steps(self) -> list:
+            """Partition the steps into groups that read the same input and can share one LLM call.
+
+            A step only joins a group when it does not depend on any step at or
+            after the group's first step, which keeps the groups acyclic.
+            """
+            groups = []
+            open_groups = {}
+            for i, step_config in enumerate(self.steps):
+                group = open_groups.get(step_config["input"])
+                if group is not None and all(j < group[0] for j in self.deps[i]):
+                    group.append(i)
+                else:
+                    group = [i]
+                    groups.append(group)
+                    open_groups[step_config["input"]] = group
+            return groups
+
+        async def _execute_dag(self):
+            """Schedule every step group as a task that starts once its dependencies have finished."""
+            semaphore = asyncio.Semaphore(self.max_parallel)
+            tasks = {}
+            # Outputs of finished steps, handed to dependent steps without re-reading the file
+            self._outputs = {}
+
+            if self.batch_shared_inputs:
+                groups = self._group_parallel_steps()
+            else:
+                groups = [[i] for i in range(len(self.steps))]
+
+            async def run_group(group):
+                await asyncio.gather(*{tasks[j] for i in group for j in self.deps[i] if j not in group})
+                async with semaphore:
+                    if len(group) == 1:
+                        await self._execute_step(group[0])
+                    else:
+                        await self._execute_batched_steps(group)
+
+            for group in groups:
+                task = asyncio.create_task(run_group(group))
+                for i in group:
+                    tasks[i] = task
+
+            unique_tasks = set(tasks.values())
+            try:
+                await asyncio.gather(*unique_tasks)
+            except BaseException:
+                for task in unique_tasks:
+                    task.cancel()
+                await asyncio.gather(*unique_tasks, return_exceptions=True)
+                raise
+            finally:
+                # The event loop ends with the run, so release its connections
+                await self.llm_client.aclose()
+
+        async def _execute_step(self, i: int):
+            """Execute a single DAG step: read its input, run its agent and write its output."""
+            step_config = self.steps[i]
+            agent_name = step_config["agent"]
+            input_path = step_config["input"]
+            output_path = step_config["output"]
+
+            print(f"\n ========== Executing Step {i+1}/{len(self.steps)}: {agent_name} ==========")
+            
+            agent = self.agents.get(agent_name)
+            if not agent:
+                raise RuntimeError(f"Agent '{agent_name}' defined in DAG flow but not found in agent definitions.")
+
+            # Read input file
+            try:
+                input_content = await self._load_input(input_path)
+            except FileNotFoundError as e:
+                raise RuntimeError(f"Input file not found for step {i+1} ({agent_name}): {input_path}") from e
+            
+            # Execute agent, streaming the response into a temporary file next to the output.
+            # The temporary file only replaces the output once the step has succeeded, so a
+            # failed step leaves any previous output untouched.
+            if self.stream_outputs:
+                try:
+                    sink, tmp_path = await asyncio.to_thread(self._open_output, output_path)
+                except Exception as e:
+                    raise RuntimeError(f"Failed to write output file for step {i+1} ({agent_name}): {output_path}") from e
+                try:
+                    with sink:
+                        output_content = await agent.aexecute(input_content, output_path, sink=sink)
+                    if output_content.startswith("Error:"):
+                        raise RuntimeError(f"Step {i+1} ({agent_name}) failed: {output_content}")
+                    try:
+                        await asyncio.to_thread(os.replace, tmp_path, output_path)
+                    except Exception as e:
+                        raise RuntimeError(f"Failed to write output file for step {i+1} ({agent_name}): {output_path}") from e
+                except BaseException:
+                    try:
+                        os.unlink(tmp_path)
+                    except OSError:
+                        pass
+                    raise
+                self._outputs[output_path] = output_content
+                return
+
+            output_content = await agent.aexecute(input_content, output_path)
+            
+            # Check if agent execution returned an error
+            if output_content.startswith("Error:"):
+                raise RuntimeError(f"Step {i+1} ({agent_name}) failed: {output_content}")
+
+            self._outputs[output_path] = output_content
+
+            # Write output file
+            try:
+                await asyncio.to_thread(self._write_file, output_path, output_content)
+            except Exception as e:
+                raise RuntimeError(f"Failed to write output file for step {i+1} ({agent_name}): {output_path}") from e
+
+        async def _execute_batched_steps(self, group: list):
+            """Execute steps that share an input file with one batched LLM call.
+
+            Cached responses are reused per step. Falls back to running the steps
+            one at a time when the batched prompt would need chunking or when the
+            model does not return every output.
+            """
+            input_path = self.steps[group[0]]["input"]
+            names = ", ".join(self.steps[i]["agent"] for i in group)
+            print(f"\n ========== Executing Steps {', '.join(str(i+1) for i in group)}/{len(self.steps)} as one batch: {names} ==========")
+
+            for i in group:
+                if self.steps[i]["agent"] not in self.agents:
+                    raise RuntimeError(f"Agent '{self.steps[i]['agent']}' defined in DAG flow but not found in agent definitions.")
+
+            try:
+                input_content = await self._load_input(input_path)
+            except FileNotFoundError as e:
+                raise RuntimeError(f"Input file not found for steps {', '.join(str(i+1) for i in group)} ({names}): {input_path}") from e
+
+            # Each agent contributes its instructions; the input section is shared
+            tasks = {}
+            prompt = ""
+            for i in group:
+                output_path = self.steps[i]["output"]
+                tasks[output_path], prompt = self.agents[self.steps[i]["agent"]]._build_prompt(input_content, output_path)
+
+            outputs = {}
+            # Empty or upstream-error inputs are answered per step without an LLM call
+            needs_llm = all(
+                self.agents[self.steps[i]["agent"]]._shortcut_response(input_content, self.steps[i]["output"]) is None
+                for i in group
+            )
+            fits_one_call = needs_llm and await asyncio.to_thread(
+                lambda: _count_tokens(prompt) <= self.llm_client._input_token_budget("".join(tasks.values()))
+            )
+            if fits_one_call:
+                # Reuse cached responses, keyed on the text the equivalent single-step call sends
+                cache_prompt = self.llm_client._unchunked_prompt(prompt, self.use_chunks)
+                for output_path, prefix in tasks.items():
+                    cached_response = await asyncio.to_thread(self.llm_client._read_cached_response, cache_prompt, prefix)
+                    if cached_response is not None:
+                        outputs[output_path] = cached_response
+                uncached = {output_path: prefix for output_path, prefix in tasks.items() if output_path not in outputs}
+                if uncached:
+                    try:
+                        batched = await self.llm_client._acall_llm_tools(prompt, uncached)
+                    except Exception as e:
+                        print(f"Batched call failed, running steps individually: {e}")
+                        batched = {}
+                    for output_path, content in batched.items():
+                        if not content.startswith("Error:"):
+                            await asyncio.to_thread(self.llm_client._write_cached_response, cache_prompt, uncached[output_path], content)
+                    outputs.update(batched)
+
+            remaining = [i for i in group if self.steps[i]["output"] not in outputs]
+            if remaining and outputs:
+                print(f"Batched call missed {len(remaining)} output(s), running those steps individually")
+
+            for i in group:
+                output_path = self.steps[i]["output"]
+                if output_path in outputs:
+                    if outputs[output_path].startswith("Error:"):
+                        raise RuntimeError(f"Step {i+1} ({self.steps[i]['agent']}) failed: {outputs[output_path]}")
+                    self._outputs[output_path] = outputs[output_path]
+                    try:
+                        await asyncio.to_thread(self._write_file, output_path, outputs[output_path])
+                    except Exception as e:
+                        raise RuntimeError(f"Failed to write output file for step {i+1} ({self.steps[i]['agent']}): {output_path}") from e
+
+            # The batch holds a single max_parallel slot, so the fallback steps run one at a time
+            for i in remaining:
+                await self._execute_step(i)
+
+        async def _load_input(self, path: str) -> str:
+            """Return a step input, taken from memory when an earlier step of this run produced it."""
+            content = self._outputs.get(path)
+            if content is None:
+                content = await asyncio.to_thread(self._read_file, path)
+            return content
+
+        @staticmethod
+        def _read_file(path: str) -> str:
+            """Read a step input file.
+
+            The file is memory-mapped and decoded straight from the mapping, which
+            avoids an intermediate bytes copy of large codebase inputs.
+            """
+            with open(path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return ""
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    with memoryview(mm) as view:
+                        content = str(view, 'utf-8')
+            # Match text-mode reads, which translate Windows and old Mac line endings
+            if '\r' in content:
+                content = content.replace('\r\n', '\n').replace('\r', '\n')
+            return content
+
+        @staticmethod
+        def _open_output(path: str):
+            """Open a temporary file beside a step output for streaming and return it with its path."""
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.{os.urandom(4).hex()}.tmp")
+            # Create with the usual umask-derived mode so the replaced output keeps normal permissions
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+            return open(fd, 'w'), tmp_path
+
+        @staticmethod
+        def _write_file(path: str, content: str):
+            """Write a step output file, creating its directory if needed."""
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as f:
+                f.write(content)
@@ -1,5 +1,26 @@
 import os 
-import re
+import mmap
+import functools
+from concurrent.futures import ProcessPoolExecutor
+
+# Start of the header line that git2text writes before each file's content.
+# A header is this marker followed by the file path and a newline.
+_FILE_HEADER_MARK = '\n# File: '
+_FILE_HEADER_MARK_BYTES = _FILE_HEADER_MARK.encode('utf-8')
+
+# Byte values of the ASCII characters that str.strip() removes
+_ASCII_WHITESPACE = frozenset(b' \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f')
+
+@functools.lru_cache(maxsize=16)
+def _chunk_file_cached(file_path, mtime_ns, file_size, chunk_size, max_open_chunks):
+    """
+    Chunks a file once per (path, modification time, size, chunker settings).
+
+    Returns a tuple so the cached result cannot be modified by callers.
+    """
+    chunker = MarkdownChunker(chunk_size=chunk_size, max_open_chunks=max_open_chunks)
+    return tuple(chunker.iter_chunks(file_path))
+
 
 class MarkdownChunker:
     """
@@ -8,50 +29,79 @@ class MarkdownChunker:
     chunk size, while splitting files that are larger than the chunk size.
     """
 
-    def __init__(self, chunk_size=1024):
+    # Separator between files that share a chunk
+    _SEPARATOR = "\n\n" + ("-" * 20) + "\n\n"
+    _SEPARATOR_LEN = len(_SEPARATOR)
+
+    def __init__(self, chunk_size=1024, max_open_chunks=8):
         """
         Initializes the MarkdownChunker.
 
         Args:
             chunk_size (int): The target maximum size of each chunk in characters.
+            max_open_chunks (int): How many partially filled chunks are kept
+                available for later files before the fullest one is finalized.
         """
         if not isinstance(chunk_size, int) or chunk_size <= 0:
             raise ValueError("chunk_size must be a positive integer.")
+        if not isinstance(max_open_chunks, int) or max_open_chunks <= 0:
+            raise ValueError("max_open_chunks must be a positive integer.")
         self.chunk_size = chunk_size
+        self.max_open_chunks = max_open_chunks
 
     def _split_large_file_body(self, header, body, chunks):
         """
         Helper method to split the body of a single large file into multiple chunks.
         Each resulting chunk will be smaller than self.chunk_size.
+
+        Every piece but the last is appended to `chunks`. The last piece is
+        returned instead (None if there is none), so the caller can pack it
+        together with other files rather than give it a chunk of its own.
         """
-        current_pos = 0
-        while current_pos < len(body):
-            # Calculate how much space is available for the body in a new chunk
-            # after accounting for the header and formatting characters.
-            available_space = self.chunk_size - (len(header) + 4) # 4 for "\n\n" * 2
-
-            # Ensure we have a positive space to avoid infinite loops
-            if available_space <= 0:
-                # This case happens if the header itself is larger than the chunk size.
-                # We truncate the header and add a note.
+        # Space left for the body in each chunk after the header and the "\n\n"
+        # formatting characters; it is the same for every piece of this file.
+        available_space = self.chunk_size - (len(header) + 4) # 4 for "\n\n" * 2
+
+        # Ensure we have a positive space to avoid infinite loops
+        if available_space <= 0:
+            # This case happens if the header itself is larger than the chunk size.
+            # We truncate the header and add a note.
+            if body:
                 truncated_header = header[:self.chunk_size - 50] + "..."
                 chunks.append(f"{truncated_header}\n\n[Content omitted: header too large for chunk size]")
-                return
+            return None
 
-            end_pos = current_pos + available_space
+        body_len = len(body)
+        rfind = body.rfind
+        chunk_header = header + "\n\n"
+        tail = None
+        current_pos = 0
+        while current_pos < body_len:
+            end_pos = min(current_pos + available_space, body_len)
             
             # To avoid splitting mid-line, find the last newline before the end position.
-            if end_pos < len(body):
-                last_newline = body.rfind('\n', current_pos, end_pos)
+            # Both candidates lie after current_pos, so every piece makes progress.
+            if end_pos < body_len:
+                last_newline = rfind('\n', current_pos, end_pos)
                 if last_newline > current_pos:
                     end_pos = last_newline
             
-            chunk_body = body[current_pos:end_pos].strip()
-            if chunk_body:
-                chunks.append(f"{header}\n\n{chunk_body}")
+            # Trim surrounding whitespace by moving the slice bounds, so the piece is
+            # copied once rather than sliced and then copied again by strip()
+            start, stop = current_pos, end_pos
+            while start < stop and body[start].isspace():
+                start += 1
+            while stop > start and body[stop - 1].isspace():
+                stop -= 1
+            if start < stop:
+                if tail is not None:
+                    chunks.append(tail)
+                tail = chunk_header + body[start:stop]
             
             current_pos = end_pos
 
+        return tail
+
     def chunk_file(self, file_path):
         """
         Reads a markdown file and splits it into chunks.
@@ -60,57 +110,210 @@ class MarkdownChunker:
         are close to `chunk_size` without exceeding it. If a single file's
         content is larger than `chunk_size`, it will be split across
         multiple chunks.
+
+        Results are cached per path until the file's modification time or size
+        changes, so re-scanning an unchanged file skips the read entirely.
         """
-        if not os.path.exists(file_path):
-            raise FileNotFoundError(f"The file at {file_path} was not found.")
+        try:
+            stat = os.stat(file_path)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"The file at {file_path} was not found.") from None
 
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        return list(_chunk_file_cached(
+            os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size, self.chunk_size, self.max_open_chunks
+        ))
 
-        file_header_pattern = r'\n# File: (.*?)\n'
-        parts = re.split(file_header_pattern, content)
-        
-        all_files = []
-        preamble = parts[0].strip()
-        if preamble:
-            all_files.append(("Unknown File (preamble)", preamble))
+    def chunk_files(self, file_paths, max_workers=None):
+        """
+        Chunks several markdown files in parallel worker processes.
+
+        Chunking is CPU-bound string work, so processes (rather than threads,
+        which would contend for the GIL) let independent files use separate
+        cores. Returns a dict mapping each path to its list of chunks.
+        """
+        file_paths = list(file_paths)
+        if len(file_paths) <= 1:
+            return {path: self.chunk_file(path) for path in file_paths}
+
+        workers = min(max_workers or os.cpu_count() or 1, len(file_paths))
+        # Hand out several paths per task to amortize the IPC round trips
+        batch = max(1, len(file_paths) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(self.chunk_file, file_paths, chunksize=batch)
+            return dict(zip(file_paths, results))
+
+    def iter_chunks(self, file_path):
+        """
+        Reads a markdown file and yields its chunks as they are completed.
+
+        Produces the same chunks as `chunk_file`, but without the cache and
+        without holding every chunk in memory at once, for callers that
+        consume them one at a time. The file stays open until the generator
+        is exhausted or closed.
+        """
+        try:
+            f = open(file_path, 'rb')
+        except FileNotFoundError:
+            raise FileNotFoundError(f"The file at {file_path} was not found.") from None
+
+        with f:
+            file_size = os.fstat(f.fileno()).st_size
+            if file_size == 0:
+                return  # mmap cannot map an empty file
+            # Scan the mapped file for headers and decode only each section's
+            # slice, instead of first decoding the whole file into one string
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                # A file of up to 4 bytes (the longest UTF-8 character) per character
+                # of chunk_size may fit in one chunk, and line endings need
+                # translating like a text-mode read; both are handled on the text
+                if file_size <= 4 * self.chunk_size or mm.find(b'\r') != -1:
+                    content = mm[:].decode('utf-8')
+                    if '\r' in content:
+                        content = content.replace('\r\n', '\n').replace('\r', '\n')
+                    yield from self._iter_text_chunks(content)
+                    return
+                yield from self._pack_files(self._iter_text_sections(mm, encoded=True))
 
-        file_paths = parts[1::2]
-        file_bodies = parts[2::2]
-        for i in range(len(file_paths)):
-            all_files.append((file_paths[i].strip(), file_bodies[i].strip()))
+    @staticmethod
+    def _make_section(path, body):
+        """
+        Builds a (path, body) pair from trimmed text, or returns None for an empty preamble.
+        """
+        if path is None:
+            return ("Unknown File (preamble)", body) if body else None
+        return path, body
+
+    def chunk_text(self, content):
+        """
+        Splits markdown text that is already in memory into chunks.
+
+        Uses the same packing rules as `chunk_file`, without a round trip
+        through the filesystem. Text that already fits in one chunk is returned
+        as that single chunk, only stripped of surrounding whitespace.
+        """
+        return list(self._iter_text_chunks(content))
+
+    def _iter_text_chunks(self, content):
+        """
+        Yields the chunks of markdown text as they are completed.
+        """
+        if len(content) <= self.chunk_size:
+            content = content.strip()
+            if content:
+                yield content
+            return
+
+        yield from self._pack_files(self._iter_text_sections(content))
+
+    def _iter_text_sections(self, content, encoded=False):
+        """
+        Yields (path, body) for each file section in markdown text.
 
-        final_chunks = []
-        current_chunk_content = ""
+        A plain `find` scan for the header marker; each header runs from the
+        marker to the next newline, and the header's leading and trailing
+        newlines belong to neither neighbouring section. With `encoded`, the
+        content is UTF-8 bytes (e.g. an mmap) and each slice is decoded as it
+        is emitted.
+        """
+        if encoded:
+            mark, newline = _FILE_HEADER_MARK_BYTES, b'\n'
+            is_space = _ASCII_WHITESPACE.__contains__
+        else:
+            mark, newline = _FILE_HEADER_MARK, '\n'
+            is_space = str.isspace
+
+        def text(start, end):
+            # Trim whitespace by moving the bounds, so the slice is not copied
+            # again by strip(); only non-ASCII whitespace in bytes is left over
+            while start < end and is_space(content[start]):
+                start += 1
+            while end > start and is_space(content[end - 1]):
+                end -= 1
+            value = content[start:end]
+            if encoded:
+                value = value.decode('utf-8')
+                if value[:1].isspace() or value[-1:].isspace():
+                    value = value.strip()
+            return value
+
+        mark_len = len(mark)
+        path = None  # None while reading the preamble
+        body_start = 0
+
+        pos = content.find(mark)
+        while pos != -1:
+            path_end = content.find(newline, pos + mark_len)
+            if path_end == -1:
+                break  # An unterminated header line is body text
+            section = self._make_section(path, text(body_start, pos))
+            if section:
+                yield section
+            path = text(pos + mark_len, path_end)
+            body_start = path_end + 1
+            pos = content.find(mark, body_start)
+
+        section = self._make_section(path, text(body_start, len(content)))
+        if section:
+            yield section
+
+    def _pack_files(self, all_files):
+        """
+        Packs (path, body) pairs into chunks of at most `chunk_size`, yielding
+        each chunk once it is finalized.
+
+        Files are placed Best-Fit in arrival order: each file goes into the open
+        chunk it fills most tightly, and a new chunk is opened only when it fits
+        in none of them. At most `max_open_chunks` chunks stay open, so memory
+        stays bounded and files from the same part of the tree stay close.
+        """
+        chunk_size = self.chunk_size
+        separator = self._SEPARATOR
+        sep_len = self._SEPARATOR_LEN
+        # Smallest possible file block, "File: \n\n"; chunks longer than this are full
+        full_len = chunk_size - (sep_len + len("File: \n\n"))
+        # Open chunks as [current_len, fragments]; fragments are joined once when finalized
+        open_chunks = []
 
         for path, body in all_files:
-            header = f"File: {path}"
-            # Use a separator to distinguish files within the same chunk
-            separator = "\n\n" + ("-" * 20) + "\n\n"
-            file_block = f"{header}\n\n{body}"
-
-            # Case 1: The file itself is larger than the chunk size.
-            if len(file_block) > self.chunk_size:
-                if current_chunk_content:
-                    final_chunks.append(current_chunk_content)
-                current_chunk_content = ""
-                self._split_large_file_body(header, body, final_chunks)
+            # Build the block in one step; the bare header is only needed for splitting
+            file_block = f"File: {path}\n\n{body}"
+
+            # Case 1: The file itself is larger than the chunk size. Its last
+            # piece is packed below like any other file block.
+            fb_len = len(file_block)
+            if fb_len > chunk_size:
+                pieces = []
+                file_block = self._split_large_file_body(f"File: {path}", body, pieces)
+                yield from pieces
+                if file_block is None:
+                    continue
+                fb_len = len(file_block)
+
+            # Case 2: The file fits in an open chunk; pick the fullest one it fits in.
+            # A chunk fits the file and its separator if it is at most `max_len` long.
+            added_len = sep_len + fb_len
+            max_len = chunk_size - added_len
+            best = None
+            for chunk in open_chunks:
+                if chunk[0] <= max_len and (best is None or chunk[0] > best[0]):
+                    best = chunk
+            if best is not None:
+                best[1].append(separator)
+                best[1].append(file_block)
+                best[0] += added_len
+                if best[0] > full_len:
+                    open_chunks.remove(best)
+                    yield "".join(best[1])
                 continue
 
-            # Case 2: Adding the next file would make the chunk too big.
-            # We add the separator length to the check.
-            if current_chunk_content and (len(current_chunk_content) + len(separator) + len(file_block) > self.chunk_size):
-                final_chunks.append(current_chunk_content)
-                current_chunk_content = file_block
-            # Case 3: The file fits.
-            else:
-                if not current_chunk_content:
-                    current_chunk_content = file_block
-                else:
-                    current_chunk_content += separator + file_block
+            # Case 3: The file fits nowhere; open a new chunk, finalizing the
+            # fullest open chunk if too many are open.
+            open_chunks.append([fb_len, [file_block]])
+            if len(open_chunks) > self.max_open_chunks:
+                fullest = max(open_chunks, key=lambda chunk: chunk[0])
+                open_chunks.remove(fullest)
+                yield "".join(fullest[1])
         
-        # Add the last chunk if it exists
-        if current_chunk_content:
-            final_chunks.append(current_chunk_content)
-            
-        return final_chunks
+        # Add the chunks that are still open
+        for chunk in open_chunks:
+            yield "".join(chunk[1])
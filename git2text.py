@@ -123,25 +123,29 @@ def build_tree(directory, tree_dict, ignore_spec, git_path):
 
 def format_tree(tree_dict, padding=''):
     """Formats the tree dictionary into a string representation."""
-    lines = ''
+    lines = []
+    _append_tree_lines(tree_dict, padding, lines)
+    return ''.join(lines)
+
+
+def _append_tree_lines(tree_dict, padding, lines):
+    """Appends the tree's lines to a shared list, so nested levels are joined only once."""
     if not tree_dict:
-        return lines
+        return
     items = list(tree_dict.items())
     last_index = len(items) - 1
 
     for index, (name, node) in enumerate(items):
         connector = '└──' if index == last_index else '├──'
         line_prefix = f"{padding}{connector} "
-        lines += f"{line_prefix}{name}"
+        lines.append(f"{line_prefix}{name}")
 
         if node['is_dir']:
-            lines += "/\n"
+            lines.append("/\n")
             new_padding = padding + ("    " if index == last_index else "│   ")
-            lines += format_tree(node['children'], new_padding)
+            _append_tree_lines(node['children'], new_padding, lines)
         else:
-            lines += "\n" # Just the filename on the line
-
-    return lines
+            lines.append("\n") # Just the filename on the line
 
 # Modified write_tree_to_file to use ignore_spec
 def write_full_tree_to_file(directory, output_handle, ignore_spec):
@@ -329,6 +333,10 @@ def on_rm_error(func, path, exc_info):
 
 # --- Main Execution Logic ---
 
+class ConversionError(RuntimeError):
+    """Raised when a project cannot be converted; details have already been printed."""
+
+
 def main():
     # --- Argument Parsing ---
     parser = argparse.ArgumentParser(
@@ -361,17 +369,38 @@ def main():
     parser.add_argument('-igi', '--ignoregitignore', action='store_true', help='Ignore project\'s .gitignore and script\'s .globalignore files.')
     args = parser.parse_args()
 
+    try:
+        convert(
+            args.path,
+            output_path=args.output,
+            ignore=args.ignore,
+            include=args.include,
+            skip_empty_files=args.skip_empty_files,
+            clipboard=args.clipboard,
+            ignoregitignore=args.ignoregitignore,
+        )
+    except ConversionError:
+        sys.exit(1)
+
+
+def convert(source_dir: str, output_path: str = None, ignore: list = None, include: list = None,
+            skip_empty_files: bool = False, clipboard: bool = False, ignoregitignore: bool = False) -> None:
+    """
+    Consolidates a project directory or git URL into a single markdown file or the clipboard.
+
+    This is the in-process entry point used by the CLI; arguments mirror the
+    command line options. Raises ConversionError on failure.
+    """
     # --- Initial Setup ---
-    if pathspec is None and not args.ignoregitignore:
+    if pathspec is None and not ignoregitignore:
         # Keep essential errors
         print("Error: 'pathspec' library is required for Git-style filtering.")
         print("Install it using 'pip install pathspec'")
         print("Alternatively, use the --ignoregitignore flag to skip .gitignore processing.")
-        sys.exit(1)
+        raise ConversionError("'pathspec' library is required for Git-style filtering.")
 
-    git_path_arg = args.path
+    git_path_arg = source_dir
     temp_dir = None
-    original_dir = os.getcwd()
 
     try:
         # --- Handle Path Argument (Local Dir or Git URL) ---
@@ -393,28 +422,26 @@ def main():
                 # print(f"Stderr: {e.stderr}") # Optional: uncomment for debugging clone errors
                 if temp_dir and os.path.exists(temp_dir):
                      shutil.rmtree(temp_dir, onerror=on_rm_error)
-                sys.exit(1)
+                raise ConversionError(f'Error cloning repository: {git_path_arg}') from e
             except FileNotFoundError:
                  # Keep essential errors
                 print("Error: 'git' command not found. Please ensure Git is installed and in your PATH.")
                 if temp_dir and os.path.exists(temp_dir):
                      shutil.rmtree(temp_dir, onerror=on_rm_error)
-                sys.exit(1)
+                raise ConversionError("'git' command not found.")
         elif os.path.isdir(git_path_arg):
             git_path = os.path.abspath(git_path_arg)
             # REMOVED print(f"Processing directory: {git_path}")
         else:
             # Keep essential errors
             print(f'Error: Path not found or not a valid directory/git URL: {git_path_arg}')
-            sys.exit(1)
-
-        os.chdir(git_path)
+            raise ConversionError(f'Path not found or not a valid directory/git URL: {git_path_arg}')
 
         # --- Build Ignore Specification ---
         all_ignore_patterns = []
         ignore_spec = None
 
-        if not args.ignoregitignore and pathspec:
+        if not ignoregitignore and pathspec:
             gitignore_path = os.path.join(git_path, '.gitignore')
             if os.path.exists(gitignore_path):
                 try:
@@ -425,7 +452,7 @@ def main():
                      # Keep essential warnings
                     print(f"Warning: Could not read .gitignore: {e}")
 
-            script_dir = os.path.dirname(os.path.realpath(sys.argv[0])) # Use sys.argv[0] for script path
+            script_dir = os.path.dirname(os.path.realpath(__file__)) # Script location, also when imported
             globalignore_path = os.path.join(script_dir, '.globalignore')
             if os.path.exists(globalignore_path):
                  try:
@@ -436,9 +463,9 @@ def main():
                       # Keep essential warnings
                      print(f"Warning: Could not read .globalignore: {e}")
 
-        if args.ignore:
-            # REMOVED print(f"Adding command line ignore patterns: {args.ignore}")
-            all_ignore_patterns.extend(args.ignore)
+        if ignore:
+            # REMOVED print(f"Adding command line ignore patterns: {ignore}")
+            all_ignore_patterns.extend(ignore)
 
         if all_ignore_patterns and pathspec:
             try:
@@ -448,32 +475,32 @@ def main():
             except Exception as e:
                 # Keep essential errors
                 print(f"Error creating ignore specification: {e}")
-                sys.exit(1)
-        # REMOVED elif args.ignoregitignore: print("Ignoring .gitignore, .globalignore files as requested.")
+                raise ConversionError(f"Error creating ignore specification: {e}") from e
+        # REMOVED elif ignoregitignore: print("Ignoring .gitignore, .globalignore files as requested.")
 
 
         # --- Build Include Specification (if -inc provided) ---
         include_spec = None
-        if args.include is not None:
-             if not args.include:
+        if include is not None:
+             if not include:
                   # Keep essential warnings
                  print("Warning: -inc flag provided with no patterns. No files will be included.")
                  if pathspec:
                       include_spec = pathspec.PathSpec.from_lines('gitwildmatch', [])
              elif pathspec:
-                 # REMOVED print(f"Using include patterns: {args.include}")
+                 # REMOVED print(f"Using include patterns: {include}")
                  try:
-                     cleaned_patterns = [p for p in args.include if p.strip() and not p.strip().startswith('#')]
+                     cleaned_patterns = [p for p in include if p.strip() and not p.strip().startswith('#')]
                      include_spec = pathspec.PathSpec.from_lines('gitwildmatch', cleaned_patterns)
                      # REMOVED print(f"Compiled {len(cleaned_patterns)} include patterns.")
                  except Exception as e:
                       # Keep essential errors
                      print(f"Error creating include specification: {e}")
-                     sys.exit(1)
+                     raise ConversionError(f"Error creating include specification: {e}") from e
              else:
                   # Keep essential errors (already checked pathspec earlier, but defensive)
                  print("Error: pathspec needed for --include but not found.")
-                 sys.exit(1)
+                 raise ConversionError("pathspec needed for --include but not found.")
 
 
         # --- Find Files to Process ---
@@ -483,11 +510,12 @@ def main():
 
         # --- Determine Output Mode (File or Clipboard) ---
         # REMOVED output_target_description = ""
-        output_to_file = args.output is not None
-        copy_to_clip = args.clipboard or not output_to_file
+        output_to_file = output_path is not None
+        copy_to_clip = clipboard or not output_to_file
 
         if output_to_file:
-            output_file_path = os.path.abspath(args.output)
+            # Relative output paths resolve against the processed project directory
+            output_file_path = os.path.abspath(os.path.join(git_path, output_path))
             # REMOVED output_target_description = f"file: {output_file_path}"
             output_dir = os.path.dirname(output_file_path)
             if output_dir:
@@ -496,13 +524,13 @@ def main():
                  except OSError as e:
                      # Keep essential errors
                      print(f"Error creating output directory {output_dir}: {e}")
-                     sys.exit(1)
+                     raise ConversionError(f"Error creating output directory {output_dir}: {e}") from e
             try:
                 output_handle = open(output_file_path, 'w', encoding='utf-8')
             except OSError as e:
                  # Keep essential errors
                  print(f"Error opening output file {output_file_path} for writing: {e}")
-                 sys.exit(1)
+                 raise ConversionError(f"Error opening output file {output_file_path} for writing: {e}") from e
         else:
             # REMOVED output_target_description = "clipboard"
             output_handle = io.StringIO()
@@ -524,7 +552,7 @@ def main():
             for i, rel_path in enumerate(files_to_process):
                 full_path = os.path.join(git_path, rel_path)
                 # REMOVED print(f"Processing [{i+1}/{total_files}]: {rel_path}")
-                append_file_content(full_path, git_path, output_handle, args.skip_empty_files)
+                append_file_content(full_path, git_path, output_handle, skip_empty_files)
 
             # --- Finalize Output ---
             if output_to_file:
@@ -555,11 +583,10 @@ def main():
                  output_handle.close()
              import traceback
              traceback.print_exc()
-             sys.exit(1)
+             raise ConversionError(f"Error during writing/processing: {e}") from e
 
     finally:
         # --- Cleanup ---
-        os.chdir(original_dir)
         if temp_dir:
             # REMOVED print(f"Cleaning up temporary directory: {temp_dir}")
             try: